@@ -3,24 +3,60 @@
 vault_onefile.py
 Single-file internal text library:
  - CLI, Middle-level GUI (Tkinter), Web (built-in http.server)
- - No external dependencies
- - XOR+Base64 encryption with key.bin
+ - No required external dependencies (cryptography/NumPy/Numba/orjson are used if installed)
+ - AES-GCM encryption with key.bin (XOR+Base64 fallback without cryptography)
  - Atomic writes, backups, automatic creation/repair of data file
+ - Changes go to an append-only journal, compacted into the data file
  - Menu allows starting/stopping webserver and choosing host/port
 """
 
 import os
 import sys
 import json
-import base64
+import binascii
+import bisect
+import gzip
+import mmap
+import hashlib
 import tempfile
 import shutil
 import datetime
+import time
+import atexit
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import socket
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs, unquote_plus
 from pathlib import Path
 
+# cryptography is optional; without it records fall back to XOR+Base64
+try:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    AES_AVAILABLE = True
+except Exception:
+    AES_AVAILABLE = False
+
+# NumPy is optional; it only speeds up the XOR step
+try:
+    import numpy as np
+    NP_AVAILABLE = True
+except Exception:
+    NP_AVAILABLE = False
+
+# Numba is optional too; when present the XOR runs in a compiled kernel
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = NP_AVAILABLE
+except Exception:
+    NUMBA_AVAILABLE = False
+
+# orjson is optional; it only speeds up JSON responses of the web server
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
 # Tkinter is included in standard Python (may not exist on minimal installs)
 try:
     import tkinter as tk
@@ -33,13 +69,18 @@ except Exception:
 # Config / Filenames
 # -----------------------
 DATA_FILE = "kutuphane.json"
+LOG_FILE = "kutuphane.log"
+ROTATED_LOG_FILE = "kutuphane.log.1"  # journal being folded in by a compaction
 KEY_FILE = "key.bin"
 BACKUP_DIR = "backups"
 MAX_BACKUPS = 7
+MAX_LOG_BYTES = 1024 * 1024
+SAVE_DELAY = 0.25  # seconds; mutations within this window share one write
 
 # -----------------------
-# Encryption (XOR + base64)
+# Encryption (AES-GCM, XOR + base64 fallback)
 # -----------------------
+AES_PREFIX = "gcm:"  # marks AES blobs; legacy XOR blobs are plain base64
 def ensure_key():
     if os.path.exists(KEY_FILE):
         try:
@@ -55,34 +96,93 @@ def ensure_key():
     return k
 
 KEY = ensure_key()
+# the XOR fallback uses KEY directly, so AES gets its own derived key
+AES = AESGCM(hashlib.sha256(b"onevault-aesgcm\0" + KEY).digest()) if AES_AVAILABLE else None
+KEY_ARR = np.frombuffer(KEY, dtype=np.uint8) if NP_AVAILABLE else None
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, boundscheck=False)
+    def _xor_kernel(buf, key, out):
+        klen = key.shape[0]
+        for i in range(buf.shape[0]):
+            out[i] = buf[i] ^ key[i % klen]
+
+    # compile at import (same read-only input types as real calls)
+    _xor_kernel(np.frombuffer(b"\0", dtype=np.uint8), KEY_ARR, np.empty(1, np.uint8))
+
+def xor_bytes(data: bytes) -> bytes:
+    if NUMBA_AVAILABLE:
+        out = np.empty(len(data), dtype=np.uint8)
+        _xor_kernel(np.frombuffer(data, dtype=np.uint8), KEY_ARR, out)
+        return out.tobytes()
+    if NP_AVAILABLE:
+        a = np.frombuffer(data, dtype=np.uint8)
+        k = np.resize(KEY_ARR, a.size)
+        return (a ^ k).tobytes()
+    k = KEY
+    return bytes([data[i] ^ k[i % len(k)] for i in range(len(data))])
 
 def encrypt(text: str) -> str:
     if text is None:
         return ""
-    tb = text.encode("utf-8")
-    k = KEY
-    enc = bytes([tb[i] ^ k[i % len(k)] for i in range(len(tb))])
-    return base64.b64encode(enc).decode("utf-8")
+    if AES_AVAILABLE:
+        nonce = os.urandom(12)
+        ct = AES.encrypt(nonce, text.encode("utf-8"), None)
+        return AES_PREFIX + binascii.b2a_base64(nonce + ct, newline=False).decode("ascii")
+    enc = xor_bytes(text.encode("utf-8"))
+    return binascii.b2a_base64(enc, newline=False).decode("ascii")
 
 def decrypt(blob: str) -> str:
     if not blob:
         return ""
     try:
-        data = base64.b64decode(blob)
-        k = KEY
-        dec = bytes([data[i] ^ k[i % len(k)] for i in range(len(data))])
+        if blob.startswith(AES_PREFIX):
+            if not AES_AVAILABLE:
+                return "[DECRYPT ERROR]"
+            raw = binascii.a2b_base64(blob[len(AES_PREFIX):])
+            dec = AES.decrypt(raw[:12], raw[12:], None)
+        else:
+            dec = xor_bytes(binascii.a2b_base64(blob))
         return dec.decode("utf-8")
-    except Exception:
+    except Exception:  # bad base64, wrong key or InvalidTag
         return "[DECRYPT ERROR]"
 
 # -----------------------
 # File safety helpers
 # -----------------------
+def _atomic_write_tmpfile(path: str, data: str):
+    # Linux: write into an unnamed inode and give it a name only once it
+    # is complete. Still a link + rename; a crash between them leaves a
+    # ._tmp_* file behind, as with mkstemp.
+    d = os.path.dirname(path) or "."
+    fd = os.open(d, os.O_TMPFILE | os.O_WRONLY, 0o600)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", closefd=False) as f:
+            f.write(data)
+        os.fsync(fd)
+        tmp = os.path.join(d, "._tmp_" + os.urandom(6).hex())
+        os.link(f"/proc/self/fd/{fd}", tmp)
+    finally:
+        os.close(fd)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        os.remove(tmp)
+        raise
+
 def atomic_write(path: str, data: str):
+    if hasattr(os, "O_TMPFILE"):
+        try:
+            _atomic_write_tmpfile(path, data)
+            return
+        except OSError:
+            pass  # fs without O_TMPFILE, no /proc, ... -> mkstemp below
     fd, tmp = tempfile.mkstemp(prefix="._tmp_", dir=".")
     try:
         with os.fdopen(fd, "w", encoding="utf-8") as f:
             f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
         os.replace(tmp, path)
     finally:
         if os.path.exists(tmp):
@@ -96,7 +196,15 @@ def make_backup():
             return
         ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
         dest = os.path.join(BACKUP_DIR, f"kutuphane_{ts}.json")
-        shutil.copy2(DATA_FILE, dest)
+        # DATA_FILE is only ever replaced, never rewritten in place, so a
+        # hardlink to the current inode is a stable snapshot
+        try:
+            if os.path.exists(dest):
+                os.remove(dest)
+            os.link(DATA_FILE, dest)
+        except OSError:
+            # cross-device, FAT, no permission, ...
+            shutil.copy2(DATA_FILE, dest)
         backups = sorted(Path(BACKUP_DIR).glob("kutuphane_*.json"), key=os.path.getmtime, reverse=True)
         for old in backups[MAX_BACKUPS:]:
             try: old.unlink()
@@ -104,140 +212,519 @@ def make_backup():
     except Exception:
         pass
 
-def safe_save_json(obj: dict):
+def safe_save_json(obj: dict) -> bool:
+    # True only if DATA_FILE now holds obj
     try:
         make_backup()
         atomic_write(DATA_FILE, json.dumps(obj, ensure_ascii=False, indent=2))
+        return True
     except Exception:
         try:
+            # don't write through into a hardlinked backup
+            if os.path.exists(DATA_FILE) and os.stat(DATA_FILE).st_nlink > 1:
+                os.remove(DATA_FILE)
             with open(DATA_FILE, "w", encoding="utf-8") as f:
                 json.dump(obj, f, ensure_ascii=False, indent=2)
+            return True
         except Exception:
-            pass
+            return False
+
+def load_json_mmap(path: str):
+    # decode straight out of the page cache; no intermediate bytes copy
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return json.loads(str(mm, "utf-8"))
+
+def empty_doc():
+    return {"_meta": {"next_id": 1}, "records": {}}
+
+def upgrade_doc(obj):
+    # {"_meta": {"next_id": n}, "records": {id: rec}}; older files are the
+    # bare records dict. Returns (doc, changed).
+    if isinstance(obj, dict) and isinstance(obj.get("_meta"), dict) and isinstance(obj.get("records"), dict):
+        meta, records = obj["_meta"], obj["records"]
+    else:
+        meta, records = {}, obj if isinstance(obj, dict) else {}
+    ids = [int(k) for k in records if k.isdigit()]
+    next_id = max(ids) + 1 if ids else 1
+    # a stale or hand-edited counter must not hand out an existing id
+    if isinstance(meta.get("next_id"), int) and meta["next_id"] >= next_id:
+        return obj, False
+    return {"_meta": {"next_id": next_id}, "records": records}, True
 
 def safe_load_json():
     if not os.path.exists(DATA_FILE):
-        safe_save_json({})
-        return {}
+        safe_save_json(empty_doc())
+        return replay_log(empty_doc())
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        try:
+            obj = load_json_mmap(DATA_FILE)
+        except (OSError, ValueError):
+            # e.g. empty file (mmap refuses length 0): plain text read
+            with open(DATA_FILE, "r", encoding="utf-8") as f:
+                obj = json.load(f)
     except Exception:
         # If corrupted, back it up and recreate empty
         try:
             make_backup()
         except: pass
-        safe_save_json({})
-        return {}
+        obj = None
+    doc, changed = upgrade_doc(obj)
+    if changed:
+        safe_save_json(doc)
+    return replay_log(doc)
+
+# -----------------------
+# Journal (append-only log on top of DATA_FILE)
+# -----------------------
+def append_log(entries: list) -> int:
+    chunk = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+    with open(LOG_FILE, "a", encoding="utf-8") as f:
+        f.write(chunk)
+        f.flush()
+    return len(chunk.encode("utf-8"))
+
+def _replay_file(path, doc):
+    data, meta = doc["records"], doc["_meta"]
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "rb+") as f:
+            raw = f.read()
+            end = raw.rfind(b"\n") + 1
+            if end < len(raw):
+                # torn last line after a crash: cut it off so the next
+                # append starts on a fresh line instead of gluing onto it
+                f.truncate(end)
+        for line in raw[:end].decode("utf-8", "replace").splitlines():
+            try:
+                entry = json.loads(line)
+            except Exception:
+                continue
+            if entry.get("op") == "put":
+                data[entry["id"]] = entry["rec"]
+                if entry["id"].isdigit():
+                    meta["next_id"] = max(meta["next_id"], int(entry["id"]) + 1)
+            elif entry.get("op") == "del":
+                data.pop(entry["id"], None)
+    except Exception:
+        pass
+
+def replay_log(doc):
+    # a rotated log only exists if a compaction did not finish; it is
+    # older than the current one
+    _replay_file(ROTATED_LOG_FILE, doc)
+    _replay_file(LOG_FILE, doc)
+    return doc
+
+def truncate_log():
+    try:
+        with open(LOG_FILE, "w", encoding="utf-8"):
+            pass
+    except Exception:
+        pass
+
+def rotate_log() -> bool:
+    # move the journal aside so a compaction can write DATA_FILE while new
+    # ops go to a fresh LOG_FILE. A rotated log left by a failed compaction
+    # is not yet in DATA_FILE, so the current one is appended to it.
+    try:
+        if not os.path.exists(LOG_FILE):
+            return True
+        if os.path.exists(ROTATED_LOG_FILE):
+            with open(LOG_FILE, "rb") as src, open(ROTATED_LOG_FILE, "ab") as dst:
+                shutil.copyfileobj(src, dst)
+            truncate_log()
+        else:
+            os.replace(LOG_FILE, ROTATED_LOG_FILE)
+        return True
+    except Exception:
+        return False
+
+def drop_rotated_log():
+    try:
+        os.remove(ROTATED_LOG_FILE)
+    except OSError:
+        pass
 
 # -----------------------
 # Vault core
 # -----------------------
+def clean_tags(tags) -> list:
+    # tags come from JSON (web, data file), so they may be anything
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        return [tags]
+    try:
+        return [str(t) for t in tags]
+    except TypeError:
+        return [str(tags)]
+
+def id_key(k: str):
+    # numeric ids in numeric order, anything else after them
+    return (0, int(k), "") if k.isdigit() else (1, 0, k)
+
 class Vault:
     def __init__(self):
+        # one re-entrant lock for all record/journal state: the web server
+        # thread and the CLI/GUI thread share this instance
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        self._compacting = False
+        self._pending = []
+        self._dirty = False
+        self._save_timer = None
+        self._ts_cache = (0, "")
         self._load()
 
     def _load(self):
-        raw = safe_load_json()
-        self.data = raw if isinstance(raw, dict) else {}
-        self._recompute_next_id()
+        # records are kept column-wise (one list per field, same index);
+        # id_to_idx maps record id -> position in every column
+        doc = safe_load_json()
+        self._meta = doc["_meta"]
+        self.ids, self.texts, self.tags, self.created, self.modified = [], [], [], [], []
+        self._plain, self._lc_text, self._lc_tags = [], [], []
+        self.id_to_idx = {}
+        self._tag_index = {}  # lowercase tag -> ids carrying it
+        self._blob = None     # joined _lc_text + row offsets, built on demand
+        for k, rec in doc["records"].items():
+            if isinstance(rec, dict):
+                self._append_row(k, rec.get("text",""), clean_tags(rec.get("tags")), rec.get("created"), rec.get("modified"))
+        self._log_bytes = os.path.getsize(LOG_FILE) if os.path.exists(LOG_FILE) else 0
+
+    def _append_op(self, op, id_, rec=None):
+        self._pending.append({"op": op, "id": id_, "rec": rec})
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        # caller holds self._lock
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SAVE_DELAY, self._flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _flush(self):
+        with self._lock:
+            self._save_timer = None
+            if not self._dirty:
+                return
+            self._log_bytes += append_log(self._pending)
+            self._pending = []
+            self._dirty = False
+            if self._log_bytes > MAX_LOG_BYTES and not self._compacting:
+                self._compacting = True
+                threading.Thread(target=self.compact, daemon=True).start()
+
+    def flush(self):
+        with self._lock:
+            if self._save_timer:
+                self._save_timer.cancel()
+            self._flush()
+
+    def compact(self):
+        # fold the journal into DATA_FILE. Only the snapshot and the log
+        # rotation run under _lock; serialising and writing the snapshot
+        # happen outside it, so other threads are not blocked meanwhile.
+        with self._compact_lock:
+            try:
+                with self._lock:
+                    if not rotate_log():
+                        self.flush()
+                        return
+                    self._log_bytes = 0
+                    snap = self._snapshot()
+                    # pending ops are in snap too; they start the new log
+                    self.flush()
+                if safe_save_json(snap):
+                    drop_rotated_log()
+                # else: the rotated log is still the only copy of those
+                # changes; it is replayed on load and kept for the next try
+            finally:
+                self._compacting = False
+
+    def _columns(self):
+        return (self.ids, self.texts, self.tags, self.created, self.modified,
+                self._plain, self._lc_text, self._lc_tags)
+
+    def _append_row(self, id_, blob, tags, created, modified, plain=None):
+        self.id_to_idx[id_] = len(self.ids)
+        self.ids.append(id_)
+        self.texts.append(blob)
+        self.tags.append(tags)
+        self.created.append(created)
+        self.modified.append(modified)
+        self._plain.append(plain)
+        self._lc_text.append(None)
+        self._lc_tags.append(None)
+        try:
+            self._index(len(self.ids) - 1)
+        except Exception:
+            self._remove_row(len(self.ids) - 1)
+            raise
+
+    def _remove_row(self, i):
+        # swap the last row into slot i so the columns stay dense
+        self._unindex_tags(i)
+        self._blob = None
+        last = len(self.ids) - 1
+        del self.id_to_idx[self.ids[i]]
+        for col in self._columns():
+            col[i] = col[last]
+            col.pop()
+        if i != last:
+            self.id_to_idx[self.ids[i]] = i
+
+    def _record(self, i):
+        # persisted (encrypted) form of row i
+        return {
+            "text": self.texts[i],
+            "tags": self.tags[i],
+            "created": self.created[i],
+            "modified": self.modified[i]
+        }
+
+    def _ordered(self, rows):
+        # deletes swap rows around, so callers that show or store records
+        # put them back in id order
+        ids = self.ids
+        return sorted(rows, key=lambda i: id_key(ids[i]))
+
+    def _snapshot(self):
+        return {
+            "_meta": dict(self._meta),
+            "records": {self.ids[i]: self._record(i) for i in self._ordered(range(len(self.ids)))}
+        }
+
+    def _decrypted(self, i):
+        if self._plain[i] is None:
+            self._plain[i] = decrypt(self.texts[i])
+        return self._plain[i]
+
+    def _index(self, i):
+        self._unindex_tags(i)
+        self._lc_text[i] = self._decrypted(i).lower()
+        self._lc_tags[i] = tuple(t.lower() for t in self.tags[i])
+        for t in self._lc_tags[i]:
+            self._tag_index.setdefault(t, set()).add(self.ids[i])
+        self._blob = None
+
+    def _unindex_tags(self, i):
+        for t in self._lc_tags[i] or ():
+            owners = self._tag_index.get(t)
+            if owners is not None:
+                owners.discard(self.ids[i])
+                if not owners:
+                    del self._tag_index[t]
 
-    def _recompute_next_id(self):
-        ids = [int(k) for k in self.data.keys() if k.isdigit()]
-        self.next_id = max(ids) + 1 if ids else 1
+    def _text_blob(self):
+        # all lowercase texts in one string so a query is a few str.find
+        # calls instead of a Python-level loop over every record
+        if self._blob is None:
+            offsets, pos = [], 0
+            for t in self._lc_text:
+                offsets.append(pos)
+                pos += len(t) + 1
+            self._blob = ("\0".join(self._lc_text), offsets)
+        return self._blob
 
     def _now_iso(self):
-        return datetime.datetime.utcnow().isoformat() + "Z"
+        # second resolution; formatted once per second, not once per call
+        t = int(time.time())
+        if t != self._ts_cache[0]:
+            iso = datetime.datetime.fromtimestamp(t, tz=datetime.timezone.utc).isoformat()
+            self._ts_cache = (t, iso.replace("+00:00", "Z"))
+        return self._ts_cache[1]
 
     def add(self, text: str, tags=None):
-        tags = list(tags) if tags else []
-        id_ = str(self.next_id)
-        rec = {
-            "text": encrypt(text),
-            "tags": tags,
-            "created": self._now_iso(),
-            "modified": self._now_iso()
-        }
-        self.data[id_] = rec
-        self.next_id += 1
-        safe_save_json(self.data)
+        tags = clean_tags(tags)
+        blob = encrypt(text)
+        now = self._now_iso()
+        with self._lock:
+            # persisted counter: ids are never reused, even after deletes
+            while str(self._meta["next_id"]) in self.id_to_idx:
+                self._meta["next_id"] += 1
+            id_ = str(self._meta["next_id"])
+            self._append_row(id_, blob, tags, now, now, plain=text or "")
+            self._meta["next_id"] += 1
+            self._append_op("put", id_, self._record(self.id_to_idx[id_]))
         return id_
 
-    def get(self, id_):
-        rec = self.data.get(str(id_))
-        if not rec:
-            return None
+    def _view(self, i):
+        # decrypted, caller-facing form of row i
         return {
-            "id": str(id_),
-            "text": decrypt(rec.get("text","")),
-            "tags": rec.get("tags",[]),
-            "created": rec.get("created"),
-            "modified": rec.get("modified")
+            "id": self.ids[i],
+            "text": self._decrypted(i),
+            "tags": self.tags[i],
+            "created": self.created[i],
+            "modified": self.modified[i]
         }
 
+    # Readers hold the lock too: a concurrent delete swaps rows around.
+    # Plaintext is already cached per row, so no decryption happens inside.
+    def get(self, id_):
+        with self._lock:
+            i = self.id_to_idx.get(str(id_))
+            if i is None:
+                return None
+            return self._view(i)
+
     def list(self, include_decrypted=True):
         out = {}
-        for k, v in self.data.items():
-            if include_decrypted:
-                out[k] = {
-                    "text": decrypt(v.get("text","")),
-                    "tags": v.get("tags",[]),
-                    "created": v.get("created"),
-                    "modified": v.get("modified")
-                }
-            else:
-                out[k] = v
+        with self._lock:
+            for i in self._ordered(range(len(self.ids))):
+                k = self.ids[i]
+                if include_decrypted:
+                    out[k] = {
+                        "text": self._decrypted(i),
+                        "tags": self.tags[i],
+                        "created": self.created[i],
+                        "modified": self.modified[i]
+                    }
+                else:
+                    out[k] = self._record(i)
         return out
 
+    def list_summaries(self, limit=80):
+        # (id, first `limit` chars on one line, has_tags), ordered by id
+        with self._lock:
+            rows = self._ordered(range(len(self.ids)))
+            return [(self.ids[i], self._decrypted(i)[:limit].replace("\n", " "), bool(self.tags[i])) for i in rows]
+
     def delete(self, id_):
         k = str(id_)
-        if k in self.data:
-            self.data.pop(k)
-            safe_save_json(self.data)
-            return True
+        with self._lock:
+            i = self.id_to_idx.get(k)
+            if i is not None:
+                self._remove_row(i)
+                self._append_op("del", k)
+                return True
         return False
 
     def update(self, id_, text=None, tags=None):
         k = str(id_)
-        if k not in self.data:
-            return False
-        if text is not None:
-            self.data[k]["text"] = encrypt(text)
-        if tags is not None:
-            self.data[k]["tags"] = list(tags)
-        self.data[k]["modified"] = self._now_iso()
-        safe_save_json(self.data)
+        blob = encrypt(text) if text is not None else None
+        tags = clean_tags(tags) if tags is not None else None
+        with self._lock:
+            i = self.id_to_idx.get(k)
+            if i is None:
+                return False
+            if text is not None:
+                self.texts[i] = blob
+                self._plain[i] = text
+            if tags is not None:
+                self.tags[i] = tags
+            self.modified[i] = self._now_iso()
+            self._index(i)
+            self._append_op("put", k, self._record(i))
         return True
 
     def search(self, q: str, by_tags=False):
-        q = q.lower().strip()
-        results = []
-        for k, v in self.data.items():
-            if by_tags:
-                tags = [t.lower() for t in v.get("tags",[])]
-                if any(q in t for t in tags):
-                    results.append(self.get(k))
-            else:
-                txt = decrypt(v.get("text",""))
-                if q in txt.lower():
-                    results.append(self.get(k))
-        return results
+        needle = q.lower().strip()
+        with self._lock:
+            return [self._view(i) for i in self._search_rows(needle, by_tags)]
+
+    def _search_rows(self, needle, by_tags):
+        if by_tags:
+            # substring match against each distinct tag, not each record
+            hits = set()
+            for tag, owners in self._tag_index.items():
+                if needle in tag:
+                    hits |= owners
+            rows = [self.id_to_idx[k] for k in hits]
+        elif "\0" in needle:
+            rows = [i for i, v in enumerate(self._lc_text) if needle in v]
+        else:
+            blob, offsets = self._text_blob()
+            rows = []
+            pos = blob.find(needle) if offsets else -1
+            while pos != -1:
+                i = bisect.bisect_right(offsets, pos) - 1
+                rows.append(i)
+                if i + 1 == len(offsets):
+                    break
+                pos = blob.find(needle, offsets[i + 1])
+        return self._ordered(rows)
 
 VAULT = Vault()
+# the debounce timer is a daemon thread; write whatever it still holds on
+# any interpreter exit (library use, uncaught errors, EOF on stdin, ...)
+atexit.register(VAULT.flush)
 
 # -----------------------
 # Web server (built-in)
 # -----------------------
+def dumps_bytes(obj) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+class VaultHTTPServer(ThreadingHTTPServer):
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, *args, **kwargs):
+        # open client sockets, so stop() can end idle keep-alive connections
+        self._conns = set()
+        self._conns_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def process_request(self, request, client_address):
+        with self._conns_lock:
+            self._conns.add(request)
+        super().process_request(request, client_address)
+
+    def shutdown_request(self, request):
+        with self._conns_lock:
+            self._conns.discard(request)
+        super().shutdown_request(request)
+
+    def close_connections(self):
+        with self._conns_lock:
+            conns = list(self._conns)
+        for c in conns:
+            try:
+                c.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def handle_error(self, request, client_address):
+        # connections cut by close_connections() or by the client are
+        # expected; anything else still gets the default traceback
+        if isinstance(sys.exc_info()[1], OSError):  # includes ConnectionError
+            return
+        super().handle_error(request, client_address)
+
 class SimpleHandler(BaseHTTPRequestHandler):
-    def _send(self, code, data, ctype="application/json"):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response sets Content-Length
+    timeout = 15  # seconds an idle keep-alive connection may hold a thread
+
+    def log_message(self, fmt, *args):
+        pass  # no per-request access log
+
+    def log_error(self, fmt, *args):
+        if fmt.startswith("Request timed out"):
+            return  # idle keep-alive connection reaching `timeout`
+        BaseHTTPRequestHandler.log_message(self, fmt, *args)
+
+    def _send(self, code, data, ctype="application/json", encoding=None, vary=None):
+        if isinstance(data, bytes):
+            body = data
+        elif isinstance(data, (dict, list)):
+            body = dumps_bytes(data)
+        else:
+            body = str(data).encode("utf-8")
         self.send_response(code)
         self.send_header("Content-Type", ctype + "; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if vary:
+            self.send_header("Vary", vary)
         self.send_header("Cache-Control", "no-store")
         self.end_headers()
-        if isinstance(data, (dict, list)):
-            self.wfile.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
-        else:
-            self.wfile.write(str(data).encode("utf-8"))
+        self.wfile.write(body)
 
     def do_GET(self):
         parsed = urlparse(self.path)
@@ -245,9 +732,12 @@ class SimpleHandler(BaseHTTPRequestHandler):
         qs = parse_qs(parsed.query)
         try:
             if path == "/":
-                # Simple web UI
-                html = WEB_UI_HTML
-                self._send(200, html, ctype="text/html")
+                # Simple web UI (pre-encoded at import); both variants
+                # carry Vary so caches keep them apart
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    self._send(200, WEB_UI_GZ, ctype="text/html", encoding="gzip", vary="Accept-Encoding")
+                else:
+                    self._send(200, WEB_UI_BYTES, ctype="text/html", vary="Accept-Encoding")
             elif path == "/list":
                 data = VAULT.list(include_decrypted=True)
                 self._send(200, data)
@@ -356,6 +846,8 @@ async function del(id){
 </script>
 </body></html>
 """
+WEB_UI_BYTES = WEB_UI_HTML.encode("utf-8")
+WEB_UI_GZ = gzip.compress(WEB_UI_BYTES, 6)
 
 # Web server runner controlling thread
 class WebServerThread:
@@ -368,7 +860,7 @@ class WebServerThread:
             return False, "Server already running"
         try:
             addr = (host, int(port))
-            self.server = HTTPServer(addr, SimpleHandler)
+            self.server = VaultHTTPServer(addr, SimpleHandler)
             self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
             self.thread.start()
             return True, f"Server started at http://{host}:{port}"
@@ -379,8 +871,10 @@ class WebServerThread:
     def stop(self):
         if not self.server:
             return False, "Not running"
+        VAULT.flush()
         try:
             self.server.shutdown()
+            self.server.close_connections()
             self.server.server_close()
             self.thread.join(timeout=2)
         except Exception:
@@ -562,24 +1056,20 @@ def run_gui():
     ttk.Button(action_frame, text="New (add)", command=lambda: gui_add()).pack(side=tk.LEFT, padx=2)
     ttk.Button(action_frame, text="Load by ID", command=lambda: gui_load_by_id()).pack(side=tk.LEFT, padx=2)
 
-    # Populate list
+    # Populate list (one variadic insert = one Tcl call, not one per row)
     def refresh_list():
+        items = [f"{k}: {txt}" for k, txt, _ in v.list_summaries(80)]
         listbox.delete(0, tk.END)
-        data = v.list()
-        for k in sorted(data.keys(), key=lambda x:int(x)):
-            txt = data[k]['text'].replace('\n',' ')
-            display = f"{k}: {txt[:80]}"
-            listbox.insert(tk.END, display)
+        listbox.insert(tk.END, *items)
     def do_search():
         q = search_var.get().strip()
         if not q:
             refresh_list()
             return
         res = v.search(q, by_tags=False)
+        items = [f"{r['id']}: {r['text'][:80].replace(chr(10),' ')}" for r in res]
         listbox.delete(0, tk.END)
-        for r in res:
-            display = f"{r['id']}: {r['text'][:80].replace('\\n',' ')}"
-            listbox.insert(tk.END, display)
+        listbox.insert(tk.END, *items)
     def gui_add():
         txt = simpledialog.askstring("Add", "Text:")
         if not txt:
@@ -685,6 +1175,7 @@ def main_menu():
         elif ch == "0":
             if WEB_THREAD.server:
                 WEB_THREAD.stop()
+            VAULT.compact()
             print("Goodbye.")
             break
         else:
@@ -699,4 +1190,5 @@ if __name__ == "__main__":
         print("\nInterrupted. Exiting.")
         if WEB_THREAD.server:
             WEB_THREAD.stop()
+        VAULT.compact()
         sys.exit(0)